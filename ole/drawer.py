@@ -1,6 +1,65 @@
 import folium
+import numpy as np
 from itertools import cycle
 
+def _clean_lines(lines_dict):
+    """
+    Convert every line's points to float64 once with NumPy, tracking the
+    running sums and extremes on the way.
+
+    Returns (clean_lines, (center_lat, center_lon),
+             [[min_lat, min_lon], [max_lat, max_lon]]).
+    """
+    clean_lines = {}
+    lo = np.full(2, np.inf)
+    hi = np.full(2, -np.inf)
+    total = np.zeros(2)
+    n_pts = 0
+    for label, pts in lines_dict.items():
+        arr = np.asarray(pts, dtype=np.float64)
+        if arr.size == 0:
+            arr = arr.reshape(0, 2)
+        elif arr.ndim != 2 or arr.shape[1] != 2:
+            raise ValueError(f"line {label!r} must be a sequence of (lat, lon) pairs")
+        clean_lines[label] = arr.tolist()
+        if len(arr):
+            lo = np.minimum(lo, arr.min(axis=0))
+            hi = np.maximum(hi, arr.max(axis=0))
+            total += arr.sum(axis=0)
+            n_pts += len(arr)
+
+    center_lat, center_lon = (total / n_pts).tolist()
+    return clean_lines, (center_lat, center_lon), [lo.tolist(), hi.tolist()]
+
+def _add_lines(m, clean_lines, styles):
+    """
+    Add all lines to m as a single GeoJson FeatureCollection, and their
+    start/end markers to one "endpoints" layer.
+    styles maps each label to (color, weight, opacity).
+    """
+    features = []
+    endpoints = folium.FeatureGroup(name="endpoints", show=True)
+    for label, pts_clean in clean_lines.items():
+        color, weight, opacity = styles[label]
+        features.append({
+            "type": "Feature",
+            "properties": {"name": label, "color": color, "weight": weight, "opacity": opacity},
+            "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in pts_clean]},
+        })
+
+        # Optional: mark start/end
+        if pts_clean:
+            folium.CircleMarker(pts_clean[0], radius=4, tooltip=f"{label} start").add_to(endpoints)
+            folium.CircleMarker(pts_clean[-1], radius=4, tooltip=f"{label} end").add_to(endpoints)
+
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name="lines",
+        style_function=lambda f: {k: f["properties"][k] for k in ("color", "weight", "opacity")},
+        tooltip=folium.GeoJsonTooltip(fields=["name"], labels=False),
+    ).add_to(m)
+    endpoints.add_to(m)
+
 def plot_lines(lines_dict, zoom_start=13, outfile="lines_map.html", tiles="OpenStreetMap"):
     """
     Plot multiple labeled polylines on an interactive folium map.
@@ -9,7 +68,7 @@ def plot_lines(lines_dict, zoom_start=13, outfile="lines_map.html", tiles="OpenS
     ----------
     lines_dict : dict[str, list[tuple[float,float]]]
         Keys are line labels; values are sequences of (lat, lon) pairs.
-        (NumPy float types are fine; they’ll be cast to float.)
+        (NumPy float types and (n, 2) arrays are fine; they’ll be cast to float.)
     zoom_start : int
         Initial zoom (only used before fit_bounds runs).
     outfile : str
@@ -20,16 +79,10 @@ def plot_lines(lines_dict, zoom_start=13, outfile="lines_map.html", tiles="OpenS
     if not lines_dict:
         raise ValueError("lines_dict is empty.")
 
-    # Flatten all points for centering / bounds
-    all_pts = []
-    for pts in lines_dict.values():
-        all_pts.extend((float(lat), float(lon)) for lat, lon in pts)
+    # Clean all points once; center = mean of all points
+    clean_lines, center, bounds = _clean_lines(lines_dict)
 
-    # Fallback center = mean of all points
-    center_lat = sum(p[0] for p in all_pts) / len(all_pts)
-    center_lon = sum(p[1] for p in all_pts) / len(all_pts)
-
-    m = folium.Map(location=(center_lat, center_lon), zoom_start=zoom_start, tiles=tiles)
+    m = folium.Map(location=center, zoom_start=zoom_start, tiles=tiles)
 
     # Nice set of folium-compatible colors, will cycle if you have many lines
     palette = cycle([
@@ -37,25 +90,12 @@ def plot_lines(lines_dict, zoom_start=13, outfile="lines_map.html", tiles="OpenS
         "darkgreen","cadetblue","darkpurple","pink","lightblue","lightgreen","gray","black","lightgray"
     ])
 
-    # Add each line in its own Layer so you can toggle them
-    for label, pts in lines_dict.items():
-        pts_clean = [(float(lat), float(lon)) for lat, lon in pts]
-        color = next(palette)
-
-        layer = folium.FeatureGroup(name=label, show=True)
-        folium.PolyLine(pts_clean, color=color, weight=3, opacity=0.9, tooltip=label).add_to(layer)
-
-        # Optional: mark start/end
-        if pts_clean:
-            folium.CircleMarker(pts_clean[0], radius=4, tooltip=f"{label} start").add_to(layer)
-            folium.CircleMarker(pts_clean[-1], radius=4, tooltip=f"{label} end").add_to(layer)
-
-        layer.add_to(m)
+    styles = {label: (next(palette), 3, 0.9) for label in clean_lines}
+    _add_lines(m, clean_lines, styles)
 
     folium.LayerControl(collapsed=False).add_to(m)
-    # Fit to all points
-    m.fit_bounds([min(all_pts, key=lambda p: p[0]),
-                  max(all_pts, key=lambda p: p[0])])  # folium accepts two corners just fine
+    # Fit to all points (south-west / north-east corners)
+    m.fit_bounds(bounds)
 
     m.save(outfile)
     return m
@@ -77,38 +117,18 @@ def plot_lines_with_highlight(
     if highlight is None:
         highlight = []
 
-    all_pts = []
-    for pts in lines_dict.values():
-        all_pts.extend((float(lat), float(lon)) for lat, lon in pts)
-
-    center_lat = sum(p[0] for p in all_pts) / len(all_pts)
-    center_lon = sum(p[1] for p in all_pts) / len(all_pts)
+    clean_lines, center, bounds = _clean_lines(lines_dict)
 
-    m = folium.Map(location=(center_lat, center_lon), zoom_start=zoom_start, tiles=tiles)
+    m = folium.Map(location=center, zoom_start=zoom_start, tiles=tiles)
 
-    for label, pts in lines_dict.items():
-        pts_clean = [(float(lat), float(lon)) for lat, lon in pts]
-        if label in highlight:
-            color = "red"
-            weight = 4
-            opacity = 1.0
-        else:
-            color = "black"
-            weight = 3
-            opacity = 0.7
-
-        layer = folium.FeatureGroup(name=label, show=True)
-        folium.PolyLine(pts_clean, color=color, weight=weight, opacity=opacity, tooltip=label).add_to(layer)
-
-        if pts_clean:
-            folium.CircleMarker(pts_clean[0], radius=4, tooltip=f"{label} start").add_to(layer)
-            folium.CircleMarker(pts_clean[-1], radius=4, tooltip=f"{label} end").add_to(layer)
-
-        layer.add_to(m)
+    styles = {
+        label: ("red", 4, 1.0) if label in highlight else ("black", 3, 0.7)
+        for label in clean_lines
+    }
+    _add_lines(m, clean_lines, styles)
 
     folium.LayerControl(collapsed=False).add_to(m)
-    m.fit_bounds([min(all_pts, key=lambda p: p[0]),
-                  max(all_pts, key=lambda p: p[0])])
+    m.fit_bounds(bounds)
 
     m.save(outfile)
     return m
@@ -126,51 +146,98 @@ def get_route_stop_positions_by_short_name(gtfs_data, route_short_name, skip_sto
     route_short_name: string, the GTFS route_short_name
     
     Returns: list of (stop_lat, stop_lon) tuples in order
-    """
-    # 1. Get the route_id for this short name
-    routes_df = gtfs_data["routes"]
-    matching_routes = routes_df[routes_df["route_short_name"] == route_short_name]
-    if matching_routes.empty:
-        return []
-
-    route_id = matching_routes.iloc[0]["route_id"]
-
-    # 2. Find trips for the given route
-    trips_for_route = gtfs_data["trips"][gtfs_data["trips"]["route_id"] == route_id]
-    if trips_for_route.empty:
-        return []
-
-    # Pick the first trip as a representative
-    trip_id = trips_for_route.iloc[0]["trip_id"]
-
-    # 3. Get ordered stops for that trip
-    stop_times = gtfs_data["stop_times"][gtfs_data["stop_times"]["trip_id"] == trip_id]
 
+    Results are memoised on gtfs_data under "_positions_cache", keyed by
+    (route_short_name, skip_stop_ids), keeping the ROUTE_CACHE_SIZE most
+    recent entries; call clear_route_cache(gtfs_data) after modifying
+    gtfs_data.
+    """
+    skip = frozenset(()) if skip_stop_ids is None else frozenset(skip_stop_ids)
+    cache = gtfs_data.setdefault("_positions_cache", {})
+    key = (route_short_name, skip)
+    positions = cache.pop(key, None)
+    if positions is None:
+        positions = _route_positions(gtfs_data, route_short_name, skip)
+        if len(cache) >= ROUTE_CACHE_SIZE:
+            # dicts keep insertion order, so the first key is the least recently used
+            del cache[next(iter(cache))]
+    cache[key] = positions
+    return list(positions)
+
+# Entries kept per gtfs_data; what-if loops over changing skip sets would
+# otherwise grow the memo without bound
+ROUTE_CACHE_SIZE = 512
+
+def _route_positions(gtfs_data, route_short_name, skip):
+    indices = _build_gtfs_indices(gtfs_data)
 
-    stop_times_sorted = stop_times.sort_values("stop_sequence")
+    # 1. Get the route_id for this short name
+    route_id = indices["short_to_route"].get(route_short_name)
+    if route_id is None:
+        return ()
 
-    # sort out skipped stops
-    if skip_stop_ids is not None:
-        stop_times_sorted = stop_times_sorted[~stop_times_sorted["stop_id"].isin(skip_stop_ids)]
+    # 2. Pick the first trip of the route as a representative
+    trip_id = indices["route_to_first_trip"].get(route_id)
+    if trip_id is None:
+        return ()
 
+    # 3. Get ordered stops for that trip, sort out skipped stops
+    stop_ids = indices["trip_to_stops"].get(trip_id, [])
+    if skip:
+        stop_ids = [stop_id for stop_id in stop_ids if stop_id not in skip]
 
     # 4. Get stop positions
-    stops_df = gtfs_data["stops"].set_index("stop_id")
-    ordered_positions = [
-        (stops_df.loc[stop_id, "stop_lat"], stops_df.loc[stop_id, "stop_lon"])
-        for stop_id in stop_times_sorted["stop_id"]
-        if stop_id in stops_df.index
-    ]
+    lookup = _stops_latlon(gtfs_data)
+    ids = np.asarray(stop_ids, dtype=object)
+    ids = ids[lookup.index.get_indexer(ids) >= 0]
+    return tuple(tuple(r) for r in lookup.reindex(ids).to_numpy())
 
-    return ordered_positions
+def clear_route_cache(gtfs_data):
+    """
+    Forget the memoised route positions and lookup tables cached on
+    gtfs_data. Call this after editing any of its DataFrames.
+    """
+    for key in ("_positions_cache", "_stops_latlon", "_gtfs_indices"):
+        gtfs_data.pop(key, None)
 
 def get_ordered_positions(gtfs_data, stop_ids):
     """
     Given a list of stop_ids and a mapping of stop_id to position,
     return a list of positions in the same order as stop_ids.
     """
-    stops_df = gtfs_data["stops"].set_index("stop_id")
-    return [(stops_df.loc[stop_id, "stop_lat"], stops_df.loc[stop_id, "stop_lon"]) for stop_id in stop_ids]
+    return [tuple(r) for r in _stops_latlon(gtfs_data).loc[list(stop_ids)].to_numpy()]
+
+def _stops_latlon(gtfs_data):
+    """
+    stop_id-indexed (stop_lat, stop_lon) frame, built once and cached on
+    gtfs_data under "_stops_latlon". Drop that key if "stops" is replaced.
+    """
+    lookup = gtfs_data.get("_stops_latlon")
+    if lookup is None:
+        lookup = gtfs_data["stops"].set_index("stop_id")[["stop_lat", "stop_lon"]]
+        gtfs_data["_stops_latlon"] = lookup
+    return lookup
+
+def _build_gtfs_indices(gtfs_data):
+    """
+    Per-key lookups used to resolve a route short name to its ordered stops,
+    built once and cached on gtfs_data under "_gtfs_indices":
+        short_to_route:      route_short_name -> first matching route_id
+        route_to_first_trip: route_id -> first trip_id of that route
+        trip_to_stops:       trip_id -> stop_ids ordered by stop_sequence
+    """
+    indices = gtfs_data.get("_gtfs_indices")
+    if indices is None:
+        routes = gtfs_data["routes"].drop_duplicates("route_short_name")
+        trips = gtfs_data["trips"].drop_duplicates("route_id")
+        stop_times = gtfs_data["stop_times"].sort_values(["trip_id", "stop_sequence"])
+        indices = {
+            "short_to_route": dict(zip(routes["route_short_name"], routes["route_id"])),
+            "route_to_first_trip": trips.set_index("route_id")["trip_id"].to_dict(),
+            "trip_to_stops": stop_times.groupby("trip_id", sort=False)["stop_id"].apply(list).to_dict(),
+        }
+        gtfs_data["_gtfs_indices"] = indices
+    return indices
 
 
 def get_multiple_routes_positions(gtfs_data, route_short_names, skip_stop_ids=None, addedRoutes=None):
@@ -186,9 +253,6 @@ def get_multiple_routes_positions(gtfs_data, route_short_names, skip_stop_ids=No
     if addedRoutes is not None:
         for short_name, stop_ids in addedRoutes.items():
             result[short_name] = get_ordered_positions(gtfs_data, stop_ids)
-    if addedRoutes is not None:
-        for short_name, stop_ids in addedRoutes.items():
-            result[short_name] = get_ordered_positions(gtfs_data, stop_ids)
 
     return result
 
@@ -2,6 +2,30 @@ import pandas as pd
 import numpy as np
 import math
 import csv
+from pandas.api.types import (
+    infer_dtype,
+    is_datetime64_any_dtype,
+    is_numeric_dtype,
+    is_object_dtype,
+    is_timedelta64_dtype,
+)
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the helpers then run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True)
+def _secs_to_hms(total):
+    return total // 3600, (total % 3600) // 60, total % 60
+
+@njit(cache=True)
+def _int_from_float(x):
+    # round() half-to-even, like the builtin; callers keep |x| < 2**63
+    return round(x)
 
 def _to_gtfs_time(v):
     if v is None or (isinstance(v, float) and math.isnan(v)):
@@ -20,18 +44,12 @@ def _to_gtfs_time(v):
                 pass
         try:
             td = pd.to_timedelta(s)
-            total = int(td.total_seconds())
-            h = total // 3600
-            m = (total % 3600) // 60
-            s = total % 60
+            h, m, s = _secs_to_hms(int(td.total_seconds()))
             return f"{h:02d}:{m:02d}:{s:02d}"
         except:
             return s
     if isinstance(v, pd.Timedelta):
-        total = int(v.total_seconds())
-        h = total // 3600
-        m = (total % 3600) // 60
-        s = total % 60
+        h, m, s = _secs_to_hms(int(v.total_seconds()))
         return f"{h:02d}:{m:02d}:{s:02d}"
     import datetime as _dt
     if isinstance(v, pd.Timestamp):
@@ -44,15 +62,17 @@ def _to_gtfs_time(v):
         return f"{v.hour:02d}:{v.minute:02d}:{v.second:02d}"
     if isinstance(v, (int, np.integer)):
         total = int(v)
-        h = total // 3600
-        m = (total % 3600) // 60
-        s = total % 60
+        if abs(total) < 2 ** 63:
+            h, m, s = _secs_to_hms(total)
+        else:
+            h, m, s = total // 3600, (total % 3600) // 60, total % 60
         return f"{h:02d}:{m:02d}:{s:02d}"
-    if isinstance(v, (float, np.floating)) and not math.isnan(v):
-        total = int(round(v))
-        h = total // 3600
-        m = (total % 3600) // 60
-        s = total % 60
+    if isinstance(v, (float, np.floating)) and math.isfinite(v):
+        if abs(v) < 2.0 ** 63:
+            h, m, s = _secs_to_hms(_int_from_float(float(v)))
+        else:
+            total = int(round(v))
+            h, m, s = total // 3600, (total % 3600) // 60, total % 60
         return f"{h:02d}:{m:02d}:{s:02d}"
     return str(v)
 
@@ -101,7 +121,10 @@ def _to_int_str(v):
     if pd.isna(v):
         return ""
     try:
-        return str(int(round(float(v))))
+        x = float(v)
+        if abs(x) < 2.0 ** 63:
+            return str(_int_from_float(x))
+        return str(int(round(x)))
     except:
         s = str(v).strip()
         return "" if s.lower() in {"nan","none"} else s
@@ -119,61 +142,286 @@ def _identity_str(v):
         return ""
     return str(v)
 
+# ---------------------------------------------------------------------------
+# Column-wise converters: same output as the scalar helpers above, but the
+# common cases run as pandas/NumPy operations on the whole column.  Cells the
+# vectorised parsers cannot handle are passed to the scalar helper.
+# ---------------------------------------------------------------------------
+
+def _column_kind(s):
+    """
+    Classify a column once so the converters can pick a path per column
+    instead of type-checking every cell: "numeric" (bools included),
+    "datetime", "date", "timedelta", "text" or "other".
+    """
+    if is_numeric_dtype(s):
+        return "numeric"
+    if is_datetime64_any_dtype(s):
+        return "datetime"
+    if is_timedelta64_dtype(s):
+        return "timedelta"
+    return _INFERRED_KINDS.get(infer_dtype(s, skipna=True), "other")
+
+_INFERRED_KINDS = {
+    "string": "text", "empty": "text",
+    "integer": "numeric", "floating": "numeric", "mixed-integer-float": "numeric", "boolean": "numeric",
+    "datetime": "datetime", "datetime64": "datetime", "date": "date",
+    "timedelta": "timedelta", "timedelta64": "timedelta",
+}
+
+def _float_values(s):
+    return s.to_numpy(dtype="float64", na_value=np.nan)
+
+def _stripped_text(s):
+    """Stripped copy of a text column as object dtype; missing cells stay NaN."""
+    if not is_object_dtype(s):
+        s = s.astype(object)
+    return s.str.strip()
+
+def _with_fallback(out, s, done, scalar):
+    """Fill the cells not yet ``done`` (and not missing) with the scalar converter."""
+    rest = ~done & s.notna().to_numpy()
+    if rest.any():
+        out[rest] = s[rest].map(scalar).to_numpy(dtype=object)
+    return pd.Series(out, index=s.index)
+
+_TWO_DIGITS = np.array([f"{i:02d}" for i in range(100)], dtype=object)
+
+def _two_digits(v):
+    small = (v >= 0) & (v < 100)
+    if small.all():
+        return _TWO_DIGITS[v]
+    out = np.char.zfill(v.astype(str), 2).astype(object)
+    out[small] = _TWO_DIGITS[v[small]]
+    return out
+
+def _join_hms(h, m, sec):
+    return _two_digits(h) + ":" + _two_digits(m) + ":" + _two_digits(sec)
+
+def _hms_from_seconds(total):
+    h, rem = np.divmod(total, 3600)
+    m, sec = np.divmod(rem, 60)
+    return _join_hms(h, m, sec)
+
+# Well-formed GTFS times are reformatted field by field, like the split
+# branch of _to_gtfs_time, without going through pd.to_timedelta; the
+# canonical HH:MM:SS form is already its own output
+_HMS_CANONICAL = r"\d\d:\d\d:\d\d"
+_HMS_PATTERN = r"^-?\d{1,2}:\d{1,2}:\d{1,2}(\.\d+)?$"
+
+def _col_time(s):
+    kind = _column_kind(s)
+    out = np.full(len(s), "", dtype=object)
+    if kind in ("numeric", "timedelta"):
+        if kind == "numeric":
+            secs = np.round(_float_values(s))
+        else:
+            secs = np.trunc(pd.to_timedelta(s).dt.total_seconds().to_numpy())
+        done = np.abs(secs) < 2.0 ** 63
+        out[done] = _hms_from_seconds(secs[done].astype(np.int64))
+        return _with_fallback(out, s, done, _to_gtfs_time)
+    if kind == "datetime":
+        try:
+            return pd.to_datetime(s).dt.strftime("%H:%M:%S").fillna("")
+        except (TypeError, ValueError):
+            return s.map(_to_gtfs_time)
+    if kind != "text":
+        return s.map(_to_gtfs_time)
+
+    txt = _stripped_text(s)
+    canonical = txt.str.fullmatch(_HMS_CANONICAL, na=False).to_numpy()
+    out[canonical] = txt[canonical].to_numpy(dtype=object)
+    done = canonical | txt.eq("").to_numpy()
+    hms = ~done & txt.str.match(_HMS_PATTERN, na=False).to_numpy()
+    if hms.any():
+        parts = txt[hms].str.split(":", n=2, expand=True)
+        out[hms] = _join_hms(
+            parts[0].astype(np.int64).to_numpy(),
+            parts[1].astype(np.int64).to_numpy(),
+            np.trunc(parts[2].astype(np.float64).to_numpy()).astype(np.int64),
+        )
+        done |= hms
+    rest = np.flatnonzero(~done & txt.notna().to_numpy())
+    if len(rest):
+        td = pd.to_timedelta(txt.iloc[rest], errors="coerce")
+        secs = np.trunc(td.dt.total_seconds().to_numpy())
+        parsed = ~np.isnan(secs)
+        out[rest[parsed]] = _hms_from_seconds(secs[parsed].astype(np.int64))
+        done[rest[parsed]] = True
+    return _with_fallback(out, s, done, _to_gtfs_time)
+
+def _col_date(s):
+    kind = _column_kind(s)
+    if kind == "numeric":
+        return _col_identity(s)
+    if kind in ("datetime", "date"):
+        try:
+            return pd.to_datetime(s).dt.strftime("%Y%m%d").fillna("")
+        except (TypeError, ValueError, AttributeError):
+            return s.map(_to_gtfs_date)
+    if kind != "text":
+        return s.map(_to_gtfs_date)
+    txt = _stripped_text(s)
+    out = np.full(len(s), "", dtype=object)
+    ymd = (txt.str.len().eq(8) & txt.str.isdigit().eq(True)).to_numpy()
+    out[ymd] = txt[ymd].to_numpy(dtype=object)
+    done = ymd | txt.eq("").to_numpy()
+    rest = np.flatnonzero(~done & txt.notna().to_numpy())
+    if len(rest):
+        # Mixed UTC offsets parse to an object Series without .dt; those
+        # cells are left to _to_gtfs_date
+        try:
+            ts = pd.to_datetime(txt.iloc[rest], errors="coerce", format="mixed")
+            if is_datetime64_any_dtype(ts):
+                parsed = ts.notna().to_numpy()
+                out[rest[parsed]] = ts[parsed].dt.strftime("%Y%m%d").to_numpy(dtype=object)
+                done[rest[parsed]] = True
+        except (TypeError, ValueError, AttributeError):
+            pass
+    return _with_fallback(out, s, done, _to_gtfs_date)
+
+def _col_zero_one(s):
+    kind = _column_kind(s)
+    out = np.full(len(s), "", dtype=object)
+    if kind == "numeric":
+        vals = np.round(_float_values(s))
+        notna = ~np.isnan(vals)
+        out[notna] = np.where(vals[notna] != 0, "1", "0")
+        return pd.Series(out, index=s.index)
+    if kind != "text":
+        return s.map(_to_zero_one_str)
+    txt = _stripped_text(s)
+    is_txt = txt.notna().to_numpy()
+    low = txt.str.lower()
+    out[is_txt] = np.select(
+        [low.isin(["true", "t", "yes", "y"]).to_numpy(), low.isin(["false", "f", "no", "n"]).to_numpy()],
+        ["1", "0"],
+        default=txt.to_numpy(dtype=object),
+    )[is_txt]
+    return _with_fallback(out, s, is_txt, _to_zero_one_str)
+
+def _numeric_values(s):
+    """float64 values of a numeric or text column, or None for any other kind."""
+    kind = _column_kind(s)
+    if kind == "numeric":
+        return _float_values(s)
+    if kind == "text":
+        return _parse_floats(_stripped_text(s))
+    return None
+
+def _parse_floats(txt):
+    """
+    Parse text cells like float(), NaN where that fails. astype is used for
+    the parse itself since pd.to_numeric's string parser is not round-trip
+    exact; to_numeric only finds the bad cells.
+    """
+    try:
+        return txt.astype("float64").to_numpy()
+    except (TypeError, ValueError):
+        pass
+    vals = np.full(len(txt), np.nan)
+    good = pd.to_numeric(txt, errors="coerce").notna().to_numpy()
+    vals[good] = txt[good].astype("float64").to_numpy()
+    return vals
+
+def _col_int(s):
+    vals = _numeric_values(s)
+    if vals is None:
+        return s.map(_to_int_str)
+    out = np.full(len(s), "", dtype=object)
+    done = np.abs(vals) < 2.0 ** 63
+    out[done] = np.round(vals[done]).astype(np.int64).astype(str).astype(object)
+    return _with_fallback(out, s, done, _to_int_str)
+
+def _trim_float_str(arr):
+    return np.char.rstrip(np.char.rstrip(arr, "0"), ".")
+
+def _col_float(s):
+    vals = _numeric_values(s)
+    if vals is None:
+        return s.map(_to_float_str)
+    mask = np.isnan(vals)
+    # %-format into one fixed-width array (NaNs as a throwaway 0.0; this is
+    # faster than np.char.mod, which loops over str.__mod__ anyway), then
+    # trim the zeros with NumPy's string ufuncs
+    strs = np.array(["%.12f" % v for v in np.where(mask, 0.0, vals).tolist()], dtype=str)
+    out = _trim_float_str(strs).astype(object)
+    out[mask] = ""
+    return _with_fallback(out, s, ~mask, _to_float_str)
+
+def _col_identity(s):
+    if is_datetime64_any_dtype(s) or is_timedelta64_dtype(s):
+        return s.map(_identity_str)
+    return s.astype(str).where(s.notna(), "")
+
+TIME_COLS = {"arrival_time","departure_time","start_time","end_time"}
+DATE_COLS = {"date","start_date","end_date"}
+ZERO_ONE_COLS = {"monday","tuesday","wednesday","thursday","friday","saturday","sunday",
+                 "pickup_type","drop_off_type","wheelchair_accessible","bikes_allowed"}
+INT_COLS = {"stop_sequence","direction_id","route_type","exception_type","location_type","transfer_type"}
+FLOAT_COLS = {"stop_lat","stop_lon","shape_dist_traveled","shape_pt_lat","shape_pt_lon"}
+
+# Column name -> converter; anything not listed is formatted as-is
+COL_DISPATCH = {
+    **{c: _col_time for c in TIME_COLS},
+    **{c: _col_date for c in DATE_COLS},
+    **{c: _col_zero_one for c in ZERO_ONE_COLS},
+    **{c: _col_int for c in INT_COLS},
+    **{c: _col_float for c in FLOAT_COLS},
+}
+
 def format_df_for_gtfs(df: pd.DataFrame) -> pd.DataFrame:
     """
     Convert a GTFS dataframe to correct string formatting for CSV export.
     Also extracts stop_lat/stop_lon from GeoPandas Point geometries if present.
     """
-    out = df.copy()
+    columns = {c: df[c] for c in df.columns}
 
     # If geometry column exists, extract lat/lon
-    if "geometry" in out.columns:
+    if "geometry" in columns:
         try:
             from shapely.geometry import Point
-            lats = []
-            lons = []
-            for g in out["geometry"]:
-                if g is None or pd.isna(g):
-                    lats.append(np.nan)
-                    lons.append(np.nan)
-                elif hasattr(g, "x") and hasattr(g, "y"):
-                    lats.append(g.y)  # lat
-                    lons.append(g.x)  # lon
-                else:
-                    lats.append(np.nan)
-                    lons.append(np.nan)
-            out["stop_lat"] = (
-                out.get("stop_lat", pd.Series(index=out.index, dtype="float64"))
-                .fillna(pd.Series(lons, index=out.index, dtype="float64"))
+            geom = columns["geometry"]
+            try:
+                # GeoSeries: vectorised accessors
+                lons = geom.x.to_numpy()
+                lats = geom.y.to_numpy()
+            except (AttributeError, ValueError):
+                lons = geom.map(lambda g: getattr(g, "x", np.nan)).to_numpy()
+                lats = geom.map(lambda g: getattr(g, "y", np.nan)).to_numpy()
+            columns["stop_lat"] = (
+                columns.get("stop_lat", pd.Series(np.nan, index=df.index))
+                .fillna(pd.Series(lats, index=df.index, dtype="float64"))
                 )
 
-            out["stop_lon"] = (
-                out.get("stop_lon", pd.Series(index=out.index, dtype="float64"))
-                .fillna(pd.Series(lons, index=out.index, dtype="float64"))
+            columns["stop_lon"] = (
+                columns.get("stop_lon", pd.Series(np.nan, index=df.index))
+                .fillna(pd.Series(lons, index=df.index, dtype="float64"))
                 )
-            out = out.drop(columns=["geometry"])
+            del columns["geometry"]
         except ImportError:
             pass  # If shapely isn't installed
 
-    time_cols = {"arrival_time","departure_time","start_time","end_time"}
-    date_cols = {"date","start_date","end_date"}
-    zero_one_cols = {"monday","tuesday","wednesday","thursday","friday","saturday","sunday",
-                     "pickup_type","drop_off_type","wheelchair_accessible","bikes_allowed"}
-    int_cols = {"stop_sequence","direction_id","route_type","exception_type","location_type","transfer_type"}
-    float_cols = {"stop_lat","stop_lon","shape_dist_traveled","shape_pt_lat","shape_pt_lon"}
-
-    for c in out.columns:
-        if c in time_cols:
-            out[c] = out[c].map(_to_gtfs_time)
-        elif c in date_cols:
-            out[c] = out[c].map(_to_gtfs_date)
-        elif c in zero_one_cols:
-            out[c] = out[c].map(_to_zero_one_str)
-        elif c in int_cols:
-            out[c] = out[c].map(_to_int_str)
-        elif c in float_cols:
-            out[c] = out[c].map(_to_float_str)
-        else:
-            out[c] = out[c].map(_identity_str)
+    # Build the output column by column instead of copying df and
+    # overwriting every column of the copy
+    new_cols = {}
+    for c, col in columns.items():
+        handler = COL_DISPATCH.get(c, _col_identity)
+        new_cols[c] = handler(col)
+
+    return pd.DataFrame(new_cols, index=df.index, copy=False)
+
+# Write buffer for write_gtfs_csv; stop_times files can be hundreds of MB
+CSV_BUFFERING = 1 << 20
 
-    return out.astype(str)
+def write_gtfs_csv(df: pd.DataFrame, path, quoting=csv.QUOTE_ALL):
+    """
+    Format df with format_df_for_gtfs and write it to path as a GTFS CSV.
+    The cells are already strings, so rows go straight to csv.writer
+    instead of through DataFrame.to_csv's per-cell formatting.
+    """
+    formatted = format_df_for_gtfs(df)
+    with open(path, "w", newline="", encoding="utf-8", buffering=CSV_BUFFERING) as fh:
+        w = csv.writer(fh, quoting=quoting, lineterminator="\n")
+        w.writerow(formatted.columns.tolist())
+        w.writerows(formatted.itertuples(index=False, name=None))